@@ -2,6 +2,7 @@
 
 Endpoint(s):
   POST /analyze - analyze text or audio conversations
+  GET /analyze/{job_id} - poll a summary queued with batch=true
 
 Example curl (JSON):
 
@@ -19,25 +20,42 @@ Example curl (form + file):
 
 """
 import logging
-from typing import Optional
+import tempfile
+from typing import AsyncIterator, Optional, Union
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+import orjson
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Response
+from fastapi.responses import StreamingResponse
 
+from app.models.schemas import BatchJobResponse, Metadata, SummaryResponse
 from app.services import gemini_service
+from app.services.batch_jobs import batch_queue
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 1 << 16
+AUDIO_SPOOL_MAX_SIZE = 1 << 20
 
-@router.post("/analyze")
-async def analyze(input_type: str = Form(...), file: UploadFile = File(...)):
+
+@router.post("/analyze", response_model=Union[SummaryResponse, BatchJobResponse], response_model_exclude_none=True)
+async def analyze(
+    response: Response,
+    input_type: str = Form(...),
+    file: UploadFile = File(...),
+    batch: bool = Form(False),
+    stream: bool = Form(False),
+):
     """Analyze an uploaded text (.txt) or audio file and return a short summary.
 
     Expected multipart/form-data fields:
       - input_type: "text" or "audio"
       - file: the uploaded file (text or audio)
+      - batch (optional): "true" to queue the summary on the Gemini Batch API
+        (half price, results within 24h) instead of answering synchronously
+      - stream (optional): "true" to stream the summary back as Server-Sent
+        Events ("data: {"delta": "..."}") as the model generates it
 
     Example curl (text file):
 
@@ -53,9 +71,16 @@ async def analyze(input_type: str = Form(...), file: UploadFile = File(...)):
 
     The endpoint returns JSON:
     {
-      "metadata": {"input_type": "text"},
+      "metadata": {"input_type": "text", "detected_languages": []},
       "summary": "..."
     }
+
+    With batch=true it returns 202 and a job id to poll via GET /analyze/{job_id}:
+    {
+      "job_id": "...",
+      "status": "QUEUED",
+      "metadata": {"input_type": "text", "detected_languages": []}
+    }
     """
 
     input_type = (input_type or "").lower()
@@ -78,8 +103,14 @@ async def analyze(input_type: str = Form(...), file: UploadFile = File(...)):
             logger.exception("Failed to read/decoding uploaded text file: %s", exc)
             raise HTTPException(status_code=400, detail="Failed to read or decode text file as UTF-8")
 
+        if batch:
+            return await _enqueue_batch(response, input_type, text)
+
+        if stream:
+            return _stream_summary(text, raw=raw)
+
         # Call Gemini summarization for text
-        result = await gemini_service.summarize_text(text)
+        result = await gemini_service.summarize_text(text, raw=raw)
 
         if isinstance(result, dict) and result.get("error"):
             raise HTTPException(status_code=500, detail=result.get("error"))
@@ -87,22 +118,70 @@ async def analyze(input_type: str = Form(...), file: UploadFile = File(...)):
         summary = result if isinstance(result, str) else result.get("summary", "")
 
     else:
-        # Audio handling
-        try:
-            audio_bytes = await file.read()
-            if not audio_bytes:
-                raise ValueError("Empty audio file")
-        except Exception as exc:
-            logger.exception("Failed to read uploaded audio file: %s", exc)
-            raise HTTPException(status_code=400, detail="Failed to read uploaded audio file")
-
-        # Call Gemini summarization for audio
-        result = await gemini_service.summarize_audio(audio_bytes)
+        # Audio handling: stream the upload into a spooled temp file (kept in
+        # memory up to 1 MB, on disk beyond) rather than reading it whole
+        with tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MAX_SIZE) as spool:
+            try:
+                size = 0
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    spool.write(chunk)
+                    size += len(chunk)
+                if not size:
+                    raise ValueError("Empty audio file")
+                spool.seek(0)
+            except Exception as exc:
+                logger.exception("Failed to read uploaded audio file: %s", exc)
+                raise HTTPException(status_code=400, detail="Failed to read uploaded audio file")
+
+            if batch or stream:
+                transcript = await gemini_service.transcribe_audio(spool)
+                if not transcript:
+                    raise HTTPException(status_code=500, detail="Transcription not available. Configure a transcription provider.")
+                if batch:
+                    return await _enqueue_batch(response, input_type, transcript)
+                return _stream_summary(transcript)
+
+            # Call Gemini summarization for audio
+            result = await gemini_service.summarize_audio(spool)
 
         if isinstance(result, dict) and result.get("error"):
             raise HTTPException(status_code=500, detail=result.get("error"))
 
         summary = result if isinstance(result, str) else result.get("summary", "")
 
-    resp = {"metadata": {"input_type": input_type}, "summary": summary}
-    return JSONResponse(content=resp)
+    return SummaryResponse(metadata=Metadata(input_type=input_type), summary=summary)
+
+
+def _stream_summary(conversation: str, raw: Optional[bytes] = None) -> StreamingResponse:
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for delta in gemini_service.stream_summary(conversation, raw=raw):
+                yield b"data: " + orjson.dumps({"delta": delta}) + b"\n\n"
+        except Exception as exc:
+            logger.exception("Streaming summarization failed: %s", exc)
+            yield b"event: error\ndata: " + orjson.dumps({"detail": "Groq text summarization failed"}) + b"\n\n"
+            return
+        yield b"event: done\ndata: {}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def _enqueue_batch(response: Response, input_type: str, conversation: str) -> BatchJobResponse:
+    job_id = await batch_queue.submit(conversation)
+    response.status_code = 202
+    return BatchJobResponse(job_id=job_id, status="QUEUED", metadata=Metadata(input_type=input_type))
+
+
+@router.get("/analyze/{job_id}", response_model=BatchJobResponse, response_model_exclude_none=True)
+async def analyze_batch_result(job_id: str):
+    """Return the state of a batch summary and, once it has finished, the summary."""
+    try:
+        result = await batch_queue.status(job_id)
+    except Exception as exc:
+        logger.exception("Failed to fetch batch job %s: %s", job_id, exc)
+        raise HTTPException(status_code=502, detail="Failed to fetch batch job status")
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+
+    return BatchJobResponse(job_id=job_id, **result)
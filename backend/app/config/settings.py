@@ -1,24 +1,29 @@
 """Application settings loader.
 
-Loads environment variables from a .env file and exposes them via `settings`.
+Loads environment variables (and a .env file) into a frozen `settings`
+instance. Values are read once at import; services copy what they need into
+module-level constants.
 """
 from pathlib import Path
-import os
-from dotenv import load_dotenv
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 ENV_PATH = Path(__file__).resolve().parents[2] / ".env"
-if ENV_PATH.exists():
-    load_dotenv(dotenv_path=ENV_PATH)
-else:
-    # try to load from working directory as a fallback
-    load_dotenv()
 
 
-class Settings:
+class Settings(BaseSettings):
     """Simple settings container. Add more values as needed."""
 
-    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    # backend/.env wins over a .env in the working directory
+    model_config = SettingsConfigDict(env_file=(".env", ENV_PATH), extra="ignore", frozen=True)
+
+    GEMINI_API_KEY: str = ""
+    GROQ_API_KEY: str = ""
+    GROQ_TOKENS_PER_MINUTE: Optional[int] = None
+    # Dev auto-reload for `python main.py`; set RELOAD=false in production
+    RELOAD: bool = True
 
 
 settings = Settings()
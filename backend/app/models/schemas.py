@@ -1,12 +1,31 @@
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
 
 
 class ClientConfig(BaseModel):
+    model_config = ConfigDict(validate_assignment=True)
+
     domain: str
     risk_keywords: List[str] = Field(default_factory=list)
     policies: List[str] = Field(default_factory=list)
 
+    # Lowercased risk_keywords (same order) and the keywords they came from
+    _lowered: Tuple[str, ...] = PrivateAttr(default_factory=tuple)
+    _lowered_from: Tuple[str, ...] = PrivateAttr(default_factory=tuple)
+
+    @model_validator(mode="after")
+    def _lower_keywords(self) -> "ClientConfig":
+        self._lowered_from = tuple(self.risk_keywords)
+        self._lowered = tuple(k.lower() if k else "" for k in self._lowered_from)
+        return self
+
+    @property
+    def lowered_keywords(self) -> Tuple[str, ...]:
+        # model_copy(update=...) and in-place list edits skip validation
+        if tuple(self.risk_keywords) != self._lowered_from:
+            self._lower_keywords()
+        return self._lowered
+
 
 class AnalyzeRequest(BaseModel):
     input_type: str
@@ -41,3 +60,16 @@ class AnalyzeResponse(BaseModel):
     insights: Insights
     risk_analysis: RiskAnalysis
     advanced_analysis: AdvancedAnalysis
+
+
+class SummaryResponse(BaseModel):
+    metadata: Metadata
+    summary: str = ""
+
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    status: str
+    metadata: Optional[Metadata] = None
+    summary: Optional[str] = None
+    detail: Optional[str] = None
@@ -0,0 +1,205 @@
+"""Queue latency-tolerant summaries into Gemini Batch API jobs.
+
+Batch jobs cost half as much as synchronous `generateContent` calls and have
+a separate, higher rate limit, at the price of latency (minutes up to 24h).
+Requests are buffered as JSONL lines and flushed into one batch job every
+`flush_size` requests or `flush_interval_s` seconds, whichever comes first.
+Callers get a `job_id` straight away and poll `status()` for the result.
+"""
+import asyncio
+import io
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+
+import orjson
+from cachetools import TTLCache
+from starlette.concurrency import run_in_threadpool
+
+from app.services.gemini_service import get_genai_client
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BATCH_MODEL = "gemini-1.5-flash"
+# Sent as systemInstruction so the boilerplate is a stable, cacheable prefix
+# rather than being concatenated onto every conversation.
+_SYSTEM_INSTRUCTION = {"parts": [{"text": "Summarize the conversation you are given in 1-2 sentences."}]}
+
+# Terminal batch states reported by the Gemini Batch API.
+JOB_STATE_SUCCEEDED = "JOB_STATE_SUCCEEDED"
+_FAILED_STATES = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+# Batch jobs finish within 24h; job ids and results are kept a day beyond
+# that for polling, then evicted so a long-running server doesn't grow.
+JOB_TTL_S = 48 * 3600
+MAX_TRACKED_JOBS = 100_000
+
+
+class BatchJobQueue:
+    """Buffer summarization requests and submit them as Gemini batch jobs."""
+
+    def __init__(self, flush_size: int = 100, flush_interval_s: float = 60.0):
+        self.flush_size = flush_size
+        self.flush_interval_s = flush_interval_s
+        self._lines: List[bytes] = []
+        self._keys: List[str] = []
+        # job_id -> batch name; None while the request is still buffered
+        self._jobs: TTLCache = TTLCache(MAX_TRACKED_JOBS, JOB_TTL_S)
+        self._errors: TTLCache = TTLCache(MAX_TRACKED_JOBS, JOB_TTL_S)
+        # batch name -> {job_id: result}, filled once the batch succeeds
+        self._results: TTLCache = TTLCache(MAX_TRACKED_JOBS // flush_size + 1, JOB_TTL_S)
+        # asyncio primitives bind to a loop, so they are made in start()
+        self._lock: Optional[asyncio.Lock] = None
+        # Set by submit() when the buffer is full, so the background task
+        # flushes it without making that caller wait on the upload
+        self._flush_now: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the periodic flush task on the running event loop."""
+        if self.running:
+            return
+        self._lock = asyncio.Lock()
+        self._flush_now = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and submit whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def submit(self, conversation: str) -> str:
+        """Buffer a summarization request and return its job id."""
+        if not self.running:
+            raise RuntimeError("Batch queue is not running")
+        job_id = uuid.uuid4().hex
+        line = orjson.dumps(
+            {
+                "key": job_id,
+                "request": {
+                    "systemInstruction": _SYSTEM_INSTRUCTION,
+                    "contents": [{"parts": [{"text": conversation or ""}]}],
+                },
+            }
+        )
+        async with self._lock:
+            self._lines.append(line)
+            self._keys.append(job_id)
+            self._jobs[job_id] = None
+            if len(self._lines) >= self.flush_size:
+                self._flush_now.set()
+        return job_id
+
+    async def flush(self) -> None:
+        """Submit everything buffered so far as one batch job."""
+        # Only swapping the buffer needs the lock; the upload runs outside it
+        # so submitters aren't held up by the Files/Batch API round trips
+        if self._lock is None:
+            return
+        async with self._lock:
+            if not self._lines:
+                return
+            payload = b"\n".join(self._lines) + b"\n"
+            keys = self._keys
+            self._lines, self._keys = [], []
+
+        try:
+            batch_name = await run_in_threadpool(self._create_batch, payload)
+        except Exception:
+            logger.exception("Failed to create Gemini batch job for %d requests", len(keys))
+            for key in keys:
+                self._errors[key] = "Failed to submit batch job"
+            return
+
+        logger.info("Submitted Gemini batch job %s with %d requests", batch_name, len(keys))
+        for key in keys:
+            self._jobs[key] = batch_name
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job's state and, once finished, its summary.
+
+        Returns None for unknown job ids.
+        """
+        if job_id not in self._jobs:
+            return None
+        if job_id in self._errors:
+            return {"status": "FAILED", "detail": self._errors[job_id]}
+
+        batch_name = self._jobs[job_id]
+        if batch_name is None:
+            return {"status": "QUEUED"}
+
+        results = self._results.get(batch_name)
+        if results is None:
+            job = await run_in_threadpool(get_genai_client().batches.get, name=batch_name)
+            state = job.state.name
+            if state in _FAILED_STATES:
+                return {"status": state, "detail": str(getattr(job, "error", "") or "Batch job failed")}
+            if state != JOB_STATE_SUCCEEDED:
+                return {"status": state}
+
+            results = await run_in_threadpool(self._download_results, job)
+            self._results[batch_name] = results
+
+        result = results.get(job_id)
+        if result is None:
+            return {"status": "FAILED", "detail": "No result returned for this request"}
+        return {"status": JOB_STATE_SUCCEEDED, **result}
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Periodic batch flush failed")
+
+    def _create_batch(self, payload: bytes) -> str:
+        client = get_genai_client()
+        uploaded = client.files.upload(
+            file=io.BytesIO(payload),
+            config={"display_name": "analyze-batch", "mime_type": "jsonl"},
+        )
+        job = client.batches.create(
+            model=GEMINI_BATCH_MODEL,
+            src=uploaded.name,
+            config={"display_name": "analyze-batch"},
+        )
+        return job.name
+
+    def _download_results(self, job: Any) -> Dict[str, Dict[str, Any]]:
+        raw = get_genai_client().files.download(file=job.dest.file_name)
+        results: Dict[str, Dict[str, Any]] = {}
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            item = orjson.loads(line)
+            key = item.get("key")
+            if item.get("error"):
+                results[key] = {"detail": str(item["error"])}
+                continue
+            try:
+                parts = item["response"]["candidates"][0]["content"]["parts"]
+                summary = "".join(part.get("text", "") for part in parts).strip()
+            except (KeyError, IndexError, TypeError):
+                results[key] = {"detail": "Malformed batch response"}
+                continue
+            results[key] = {"summary": summary}
+        return results
+
+
+batch_queue = BatchJobQueue()
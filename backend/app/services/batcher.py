@@ -0,0 +1,125 @@
+"""Micro-batcher that coalesces concurrent model requests.
+
+Callers `submit()` a single item and await its result. A background task
+collects whatever arrives within `max_wait_ms` (up to `max_batch` items) and
+hands the whole batch to one handler call, so concurrent `/analyze` requests
+share a single model round trip instead of each spending its own.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+BatchHandler = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+@dataclass(frozen=True)
+class BatcherConfig:
+    """Tuning knobs for `MicroBatcher`."""
+
+    max_batch: int = 16
+    queue_size: int = 128
+    max_wait_ms: int = 50
+
+
+class MicroBatcher:
+    """Collect submitted items into batches and resolve each caller's future.
+
+    The handler receives a list of items and must return a list of results in
+    the same order. If it raises, every caller in that batch gets the error.
+    """
+
+    def __init__(self, handler: BatchHandler, config: Optional[BatcherConfig] = None):
+        self._handler = handler
+        self.config = config or BatcherConfig()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self) -> None:
+        """Start the collector task on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.config.queue_size)
+        self._worker = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        """Stop collecting and fail any request still waiting in the queue."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        while self._queue is not None and not self._queue.empty():
+            _, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        """Queue `item` for the next batch and wait for its result."""
+        if not self.running:
+            raise RuntimeError("Batcher is not running")
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        return await fut
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        max_wait = self.config.max_wait_ms / 1000.0
+
+        while True:
+            batch: List[Tuple[Any, asyncio.Future]] = [await self._queue.get()]
+            deadline = loop.time() + max_wait
+            try:
+                while len(batch) < self.config.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Stopped mid-collection: these items are already off the
+                # queue, so fail them here or their callers would hang
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(RuntimeError("Batcher stopped"))
+                raise
+
+            # Dispatch without awaiting so the next batch can be collected
+            # while this one is waiting on the model.
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        items = [item for item, _ in batch]
+        try:
+            results = await self._handler(items)
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch handler returned {len(results)} results for {len(batch)} items")
+        except Exception as exc:
+            logger.exception("Batch of %d items failed", len(batch))
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+
+        for (_, fut), result in zip(batch, results):
+            # The caller may have gone away (e.g. client disconnect)
+            if not fut.done():
+                fut.set_result(result)
@@ -0,0 +1,182 @@
+"""In-process rate limiting for model API calls.
+
+`ModelLimiter` combines three things per model:
+
+- a concurrency gate whose ceiling adapts: it shrinks by one on every 429
+  and grows by one after a run of successes (up to `adaptive_ceiling`);
+- an optional token bucket sized to the provider's tokens-per-minute limit;
+- retry of 429 responses, honouring `Retry-After` plus random jitter, with
+  exponential backoff when the header is missing.
+
+Counters for requests, throttles, retries and ceiling changes are kept in
+`limiter.counters` for logging/inspection.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class ModelLimiter:
+    """Concurrency + token-bucket limiter for one model."""
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int = 4,
+        adaptive_ceiling: int = 8,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 3,
+        backoff_s: float = 1.0,
+        jitter_s: float = 1.0,
+        grow_after: int = 10,
+    ):
+        self.name = name
+        self.limit = concurrency
+        self.adaptive_ceiling = max(concurrency, adaptive_ceiling)
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.jitter_s = jitter_s
+        self.grow_after = grow_after
+        self.counters: Counter = Counter()
+
+        self._in_flight = 0
+        self._successes = 0
+        self._tokens = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        # asyncio primitives bind to a loop; limiters are built at import,
+        # so these are (re)made for whichever loop is running (see _bind_loop)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cond: Optional[asyncio.Condition] = None
+        self._bucket_lock: Optional[asyncio.Lock] = None
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._cond = asyncio.Condition()
+            self._bucket_lock = asyncio.Lock()
+            self._in_flight = 0
+
+    @asynccontextmanager
+    async def acquire(self, est_tokens: int = 0) -> AsyncIterator[None]:
+        """Wait for a token-bucket allowance and a concurrency slot."""
+        self._bind_loop()
+        await self._take_tokens(est_tokens)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    async def run(
+        self, send: Callable[[], Awaitable[httpx.Response]], est_tokens: int = 0
+    ) -> httpx.Response:
+        """Call `send()` under the limiter, retrying 429 responses.
+
+        Returns the last response; the caller decides how to handle errors.
+        """
+        attempt = 0
+        while True:
+            self.counters["requests"] += 1
+            async with self.acquire(est_tokens):
+                response = await send()
+
+            await self.record(response)
+            if response.status_code != 429 or attempt >= self.max_retries:
+                return response
+            attempt += 1
+            await self._backoff(response, attempt)
+
+    @asynccontextmanager
+    async def stream(
+        self, open_stream: Callable[[], AsyncContextManager[httpx.Response]], est_tokens: int = 0
+    ) -> AsyncIterator[httpx.Response]:
+        """`run` for streamed responses: `open_stream()` is e.g. `client.stream(...)`.
+
+        429s are retried before any of the body is read; the concurrency slot
+        is held while the caller reads the yielded response.
+        """
+        attempt = 0
+        while True:
+            self.counters["requests"] += 1
+            async with self.acquire(est_tokens):
+                async with open_stream() as response:
+                    await self.record(response)
+                    if response.status_code != 429 or attempt >= self.max_retries:
+                        yield response
+                        return
+            attempt += 1
+            await self._backoff(response, attempt)
+
+    async def record(self, response: httpx.Response) -> None:
+        """Feed a response into the adaptive ceiling: 429 shrinks it, successes grow it."""
+        self._bind_loop()
+        if response.status_code == 429:
+            await self._on_throttle()
+        elif response.is_success:
+            await self._on_success()
+
+    async def _backoff(self, response: httpx.Response, attempt: int) -> None:
+        delay = _retry_after(response)
+        if delay is None:
+            delay = self.backoff_s * (2 ** (attempt - 1))
+        delay += random.uniform(0, self.jitter_s)
+        self.counters["retries"] += 1
+        logger.warning("%s throttled (429); retry %d in %.2fs", self.name, attempt, delay)
+        await asyncio.sleep(delay)
+
+    async def _take_tokens(self, n: int) -> None:
+        if not self.tokens_per_minute or n <= 0:
+            return
+        n = min(n, self.tokens_per_minute)
+        rate = self.tokens_per_minute / 60.0
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._last_refill) * rate)
+                self._last_refill = now
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                await asyncio.sleep((n - self._tokens) / rate)
+
+    async def _on_success(self) -> None:
+        self._successes += 1
+        if self._successes < self.grow_after or self.limit >= self.adaptive_ceiling:
+            return
+        self._successes = 0
+        async with self._cond:
+            self.limit += 1
+            self.counters["ceiling_grows"] += 1
+            self._cond.notify_all()
+        logger.debug("%s concurrency ceiling raised to %d", self.name, self.limit)
+
+    async def _on_throttle(self) -> None:
+        self.counters["throttled"] += 1
+        self._successes = 0
+        if self.limit > 1:
+            self.limit -= 1
+            self.counters["ceiling_shrinks"] += 1
+            logger.info("%s concurrency ceiling lowered to %d", self.name, self.limit)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Return the Retry-After delay in seconds, if the header is numeric."""
+    value = response.headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
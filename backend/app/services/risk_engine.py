@@ -1,50 +1,218 @@
 """Simple risk engine that detects keywords and computes a score.
 
-This is intentionally simple for hackathon/demo purposes.
+This is intentionally simple for hackathon/demo purposes. Keyword matching
+picks the fastest backend that is installed:
+
+1. `hyperscan` - keywords compiled into a vectorized (SIMD) literal matcher;
+2. `pyahocorasick` - an Aho-Corasick automaton, one pass over the text;
+3. `numba` - a JIT-compiled scan;
+4. plain substring checks.
+
+Hyperscan is x86-only, so ARM/Windows deployments fall through to the next one.
 """
-from typing import Dict, Any, List
+import asyncio
+import threading
+from functools import lru_cache
+from typing import Dict, Any, List, Set, Tuple, Union
 
+from app.models.schemas import ClientConfig
 
-async def analyze_risk(conversation: str, config: Dict[str, Any], sentiment: str) -> Dict[str, Any]:
-    """Analyze a conversation for configured risk keywords and return a small risk report.
+try:
+    import hyperscan
+except ImportError:  # pragma: no cover - optional dependency
+    hyperscan = None
 
-    Args:
-        conversation: text to analyze
-        config: dict with domain, risk_keywords, policies
-        sentiment: sentiment string from model (e.g., 'Positive', 'Negative', 'Neutral')
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - optional dependency
+    ahocorasick = None
+
+try:
+    import numpy as np
+    from numba import njit, prange, types
+except ImportError:  # pragma: no cover - optional dependency
+    njit = None
+
+
+if njit is not None:
+    _RO_BYTES = types.Array(types.uint8, 1, "C", readonly=True)
+
+    # Explicit signature: compiled once at import (and cached on disk), not on
+    # the first request.
+    @njit(types.boolean[::1](_RO_BYTES, _RO_BYTES, types.int32[::1]), cache=True, parallel=True)
+    def _scan(text, kw_buf, kw_offsets):
+        """Flag which keywords (packed into kw_buf, split by kw_offsets) occur in text."""
+        n_kw = kw_offsets.shape[0] - 1
+        n = text.shape[0]
+        found = np.zeros(n_kw, dtype=np.bool_)
+        for k in prange(n_kw):
+            start = kw_offsets[k]
+            m = kw_offsets[k + 1] - start
+            if m > 0:
+                for i in range(n - m + 1):
+                    j = 0
+                    while j < m and text[i + j] == kw_buf[start + j]:
+                        j += 1
+                    if j == m:
+                        found[k] = True
+                        break
+        return found
+
+    @lru_cache(maxsize=256)
+    def _pack_keywords(lowered_keywords: Tuple[str, ...]) -> Tuple[Any, Any]:
+        """Pack keywords into one UTF-8 buffer plus an offsets array."""
+        encoded = [kw.encode("utf-8") for kw in lowered_keywords]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum([len(kw) for kw in encoded])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+@lru_cache(maxsize=256)
+def _build_hyperscan_db(lowered_keywords: Tuple[str, ...]) -> Tuple[Any, threading.local]:
+    """Compile (once per keyword set) a literal Hyperscan database.
+
+    Returns the database plus a thread-local holder for its scratch space,
+    since scans run in worker threads and scratch cannot be shared.
+    """
+    ids = [i for i, kw in enumerate(lowered_keywords) if kw]
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[lowered_keywords[i].encode("utf-8") for i in ids],
+        ids=ids,
+        elements=len(ids),
+        flags=hyperscan.HS_FLAG_SINGLEMATCH,
+        literal=True,
+    )
+    return db, threading.local()
+
+
+def _hyperscan_find(lowered_text: str, lowered_keywords: Tuple[str, ...]) -> Set[str]:
+    db, local = _build_hyperscan_db(lowered_keywords)
+    scratch = getattr(local, "scratch", None)
+    if scratch is None:
+        scratch = local.scratch = hyperscan.Scratch(db)
+
+    matched: Set[int] = set()
+
+    def on_match(kw_id, start, end, flags, context):
+        matched.add(kw_id)
+
+    db.scan(lowered_text.encode("utf-8"), match_event_handler=on_match, scratch=scratch)
+    return {lowered_keywords[i] for i in matched}
+
+
+@lru_cache(maxsize=256)
+def _build_automaton(lowered_keywords: Tuple[str, ...]) -> Any:
+    """Build (once per keyword set) an automaton over lowercased keywords."""
+    automaton = ahocorasick.Automaton()
+    for kw in lowered_keywords:
+        if kw:
+            automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return automaton
+
+
+def _find_keywords(lowered_text: str, lowered_keywords: Tuple[str, ...]) -> Set[str]:
+    """Return the subset of `lowered_keywords` that occur in `lowered_text`."""
+    if not any(lowered_keywords):
+        return set()
+
+    if hyperscan is not None:
+        return _hyperscan_find(lowered_text, lowered_keywords)
+
+    if ahocorasick is not None:
+        automaton = _build_automaton(lowered_keywords)
+        return {kw for _, kw in automaton.iter(lowered_text)}
+
+    if njit is not None:
+        # UTF-8 is self-synchronizing, so a byte-level match is a str match
+        kw_buf, kw_offsets = _pack_keywords(lowered_keywords)
+        text = np.frombuffer(lowered_text.encode("utf-8"), dtype=np.uint8)
+        found = _scan(text, kw_buf, kw_offsets)
+        return {kw for kw, hit in zip(lowered_keywords, found) if hit}
+
+    return {kw for kw in lowered_keywords if kw and kw in lowered_text}
+
+
+def scan_keywords(conversation: str, config: Union[ClientConfig, Dict[str, Any]]) -> Dict[str, Any]:
+    """Sentiment-independent half of the risk analysis: the keyword scan.
+
+    This is the CPU-bound part, so callers can run it in a worker thread
+    while waiting on the model for sentiment, then call `finalize`.
 
     Returns:
-        dict with keys: risk_detected (bool), trigger_keywords (list), risk_score (float), call_outcome (str)
+        dict with keys: trigger_keywords (list), keyword_count (int)
     """
-    if not conversation:
-        conversation = ""
+    if isinstance(config, ClientConfig):
+        keywords: List[str] = config.risk_keywords
+        lowered_keywords = config.lowered_keywords
+    else:
+        keywords = config.get("risk_keywords", []) or []
+        lowered_keywords = ()
+
+    if len(lowered_keywords) != len(keywords):
+        lowered_keywords = tuple(k.lower() if k else "" for k in keywords)
 
-    keywords: List[str] = config.get("risk_keywords", []) or []
-    lowered = conversation.lower()
-    trigger_keywords = [k for k in keywords if k and k.lower() in lowered]
+    if not keywords:
+        return {"trigger_keywords": [], "keyword_count": 0}
 
+    found = _find_keywords((conversation or "").lower(), lowered_keywords)
+    trigger_keywords = [k for k, kw in zip(keywords, lowered_keywords) if kw and kw in found]
+
+    return {"trigger_keywords": trigger_keywords, "keyword_count": len(keywords)}
+
+
+def _outcome(sentiment_lower: str, negative: bool) -> str:
+    """Decide call outcome based on sentiment."""
+    if negative:
+        return "Escalated"
+    if "pos" in sentiment_lower:
+        return "Resolved"
+    return "Neutral"
+
+
+def finalize(scan_result: Dict[str, Any], sentiment: str) -> Dict[str, Any]:
+    """Combine a `scan_keywords` result with the model's sentiment into the risk report."""
+    trigger_keywords = scan_result["trigger_keywords"]
     risk_detected = len(trigger_keywords) > 0
 
     # Simple score: fraction of configured keywords that appeared, clipped to [0,1]
-    denom = max(1, len(keywords))
+    denom = max(1, scan_result["keyword_count"])
     score = min(1.0, len(trigger_keywords) / denom)
 
     # Boost score slightly if sentiment is negative
     sentiment_lower = (sentiment or "").lower()
-    if "neg" in sentiment_lower:
+    negative = "neg" in sentiment_lower
+    if negative:
         score = min(1.0, score + 0.15)
 
-    # Decide call outcome based on sentiment
-    if "neg" in sentiment_lower:
-        call_outcome = "Escalated"
-    elif "pos" in sentiment_lower:
-        call_outcome = "Resolved"
-    else:
-        call_outcome = "Neutral"
-
     return {
         "risk_detected": risk_detected,
         "trigger_keywords": trigger_keywords,
         "risk_score": round(float(score), 3),
-        "call_outcome": call_outcome,
+        "call_outcome": _outcome(sentiment_lower, negative),
     }
+
+
+async def analyze_risk(conversation: str, config: Union[ClientConfig, Dict[str, Any]], sentiment: str) -> Dict[str, Any]:
+    """Analyze a conversation for configured risk keywords and return a small risk report.
+
+    The keyword scan runs in a worker thread so it does not block the event
+    loop (and can overlap with other awaits when gathered).
+
+    Args:
+        conversation: text to analyze
+        config: ClientConfig (preferred, keywords are pre-lowered) or a dict
+            with domain, risk_keywords, policies
+        sentiment: sentiment string from model (e.g., 'Positive', 'Negative', 'Neutral')
+
+    Returns:
+        dict with keys: risk_detected (bool), trigger_keywords (list), risk_score (float), call_outcome (str)
+    """
+    keywords = config.risk_keywords if isinstance(config, ClientConfig) else config.get("risk_keywords")
+    if not keywords:
+        # Nothing to scan for: skip the lowercase copy and the thread hop
+        return finalize({"trigger_keywords": [], "keyword_count": 0}, sentiment)
+
+    scan = await asyncio.to_thread(scan_keywords, conversation, config)
+    return finalize(scan, sentiment)
@@ -0,0 +1,77 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled version of `parser._py_first_json_like_segment`.
+
+Optional: build in place with `cythonize -i app/utils/_parser_fast.pyx`
+(from the backend directory). `parser.py` falls back to the pure-Python
+scanner when this module is not built.
+"""
+
+
+cpdef object first_json_like_segment(str text):
+    """Find first curly-brace or square-bracket JSON-like segment in text.
+
+    Trailing commas before a closer are dropped from the returned segment.
+    """
+    cdef Py_ssize_t n = len(text)
+    cdef Py_ssize_t brace = text.find("{")
+    cdef Py_ssize_t bracket = text.find("[")
+    cdef Py_ssize_t start, i, end, depth, last_comma, prev
+    cdef list starts, commas, pieces
+    cdef Py_UCS4 ch, opener, closer
+    cdef bint in_string, escaped
+
+    if brace == -1 or bracket == -1:
+        starts = [max(brace, bracket)] if brace != bracket else []
+    else:
+        starts = [min(brace, bracket), max(brace, bracket)]
+
+    for start in starts:
+        opener = text[start]
+        closer = u"}" if opener == u"{" else u"]"
+        depth = 0
+        end = -1
+        last_comma = -1
+        commas = []
+        in_string = False
+        escaped = False
+        for i in range(start, n):
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == u"\\":
+                    escaped = True
+                elif ch == u'"':
+                    in_string = False
+            elif ch == u'"':
+                in_string = True
+                last_comma = -1
+            elif ch == u",":
+                last_comma = i
+            elif ch == u"}" or ch == u"]":
+                if last_comma != -1:
+                    commas.append(last_comma)
+                    last_comma = -1
+                if ch == closer:
+                    depth -= 1
+                    if depth == 0:
+                        end = i + 1
+                        break
+            elif ch == opener:
+                depth += 1
+                last_comma = -1
+            elif not ch.isspace():
+                last_comma = -1
+
+        if end == -1:
+            continue
+        if not commas:
+            return text[start:end]
+        pieces = []
+        prev = start
+        for i in commas:
+            pieces.append(text[prev:i])
+            prev = i + 1
+        pieces.append(text[prev:end])
+        return "".join(pieces)
+    return None
@@ -4,31 +4,105 @@ Gemini sometimes returns text that contains JSON embedded in prose. The helpers
 here extract the first JSON object or array from a string and try to coerce it
 into valid JSON, with defensive fallbacks.
 """
+import asyncio
+import copy
 import json
 import re
-from typing import Any, Optional
+from functools import lru_cache
+from typing import Any, Optional, Tuple, Union
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
 
-def _first_json_like_segment(text: str) -> Optional[str]:
-    """Find first curly-brace or square-bracket JSON-like segment in text."""
-    # Search for {...} or [...] blocks
-    # This is a heuristic: find the first '{' and the matching '}' (or '[' and matching ']')
-    for opener, closer in [("{", "}"), ("[", "]")]:
-        start = text.find(opener)
-        if start == -1:
+# 19+ digits may not fit in 64 bits; orjson would turn such ints into floats
+_LONG_DIGITS_RE = re.compile(r"\d{19}")
+_LONG_DIGITS_BYTES_RE = re.compile(rb"\d{19}")
+
+
+def _loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """orjson.loads, or json.loads when the input may hold ints wider than 64 bits."""
+    if orjson is not None:
+        pattern = _LONG_DIGITS_RE if isinstance(data, str) else _LONG_DIGITS_BYTES_RE
+        if not pattern.search(data):
+            return orjson.loads(data)
+    return json.loads(data if isinstance(data, (str, bytes, bytearray)) else bytes(data))
+
+
+_DECODER = json.JSONDecoder()
+_CLOSERS = {"{": "}", "[": "]"}
+_TRAILING_COMMA_RE = re.compile(r",(?=\s*[}\]])")
+# One token per match: a whole string literal, an unterminated quote, a
+# bracket, or a comma followed only by whitespace and a closer.
+_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|"|[{}\[\]]|,(?=\s*[}\]])', re.DOTALL)
+
+
+def _opener_starts(text: str) -> Tuple[int, ...]:
+    """Positions of the first '{' and first '[' in text, earliest first."""
+    # Unrolled for the two bracket types instead of sorting a generator
+    brace = text.find("{")
+    bracket = text.find("[")
+    if brace == -1:
+        return () if bracket == -1 else (bracket,)
+    if bracket == -1:
+        return (brace,)
+    return (brace, bracket) if brace < bracket else (bracket, brace)
+
+
+def _py_first_json_like_segment(text: str) -> Optional[str]:
+    """Find first curly-brace or square-bracket JSON-like segment in text.
+
+    Trailing commas before a closer are dropped from the returned segment.
+    """
+    # This is a heuristic: start at whichever of '{' / '[' appears first and
+    # find its matching closer. Only if that opener is never closed do we fall
+    # back to the other bracket type.
+    #
+    # The regex tokenizer skips prose in C and hands back string literals
+    # whole, so a "}" inside a value does not end the segment early, and
+    # trailing commas are found in the same pass instead of a second re.sub.
+    # Globals and bound methods are looked up once, not per token.
+    find = text.find
+    finditer = _TOKEN_RE.finditer
+    closers = _CLOSERS
+    for start in _opener_starts(text):
+        opener = text[start]
+        closer = closers[opener]
+        if find(closer, start + 1) == -1:
+            # Never closed: don't tokenize the rest of the text for nothing
             continue
-        depth = 0
-        for i in range(start, len(text)):
-            ch = text[i]
-            if ch == opener:
+        depth = 1
+        commas = []
+        add_comma = commas.append
+        for match in finditer(text, start + 1):
+            token = match[0]
+            if token == opener:
                 depth += 1
-            elif ch == closer:
+            elif token == closer:
                 depth -= 1
                 if depth == 0:
-                    return text[start : i + 1]
+                    pieces = []
+                    prev = start
+                    for comma in commas:
+                        pieces.append(text[prev:comma])
+                        prev = comma + 1
+                    pieces.append(text[prev:match.end()])
+                    return "".join(pieces)
+            elif token == ",":
+                add_comma(match.start())
+            elif token == '"':
+                # Unterminated string: this opener is never closed
+                break
     return None
 
 
+try:
+    from app.utils._parser_fast import first_json_like_segment as _first_json_like_segment
+except ImportError:  # pragma: no cover - optional compiled extension
+    _first_json_like_segment = _py_first_json_like_segment
+
+
 def _cleanup_common_issues(s: str) -> str:
     """Try to fix a few common non-JSON formatting issues.
 
@@ -38,38 +112,97 @@ def _cleanup_common_issues(s: str) -> str:
     """
     out = s.strip()
 
-    # Remove trailing commas before object/array close
-    out = re.sub(r",\s*([}\]])", r"\1", out)
+    # Remove trailing commas before object/array close; skip the regex when
+    # the text has no comma
+    if "," in out:
+        out = _TRAILING_COMMA_RE.sub("", out)
 
     # Attempt to normalize single quotes to double quotes when it looks like JSON with keys
     # This is heuristic and will be tried inside a try/except when loading JSON.
     return out
 
 
-def safe_parse_json(text: str) -> Any:
-    """Attempt to extract and parse the first JSON object/array from text.
+@lru_cache(maxsize=512)
+def _parse_extracted(text: str) -> Any:
+    """Extract and parse JSON from `text`.
 
-    Raises ValueError if parsing fails.
+    Cached on the input text. Callers may mutate the result, so
+    `safe_parse_json` hands out deep copies rather than the cached value.
     """
-    if not text or not isinstance(text, str):
-        raise ValueError("No text to parse")
+    # Well-formed JSON after some prose: let the C decoder parse from the
+    # first opener and ignore whatever follows. Later openers are not tried,
+    # since they may sit inside a malformed outer value and yield a fragment.
+    # The decoded value is returned as-is (not re-encoded), so big ints and
+    # NaN survive; any failure, including very deep nesting, falls through.
+    starts = _opener_starts(text)
+    if starts:
+        try:
+            return _DECODER.raw_decode(text, starts[0])[0]
+        except (ValueError, RecursionError):
+            pass
 
     segment = _first_json_like_segment(text)
-    if not segment:
+    if segment:
+        # Already bracket-trimmed with trailing commas removed
+        cleaned = segment
+    else:
         # As a last resort, try the whole text
         segment = text
-
-    cleaned = _cleanup_common_issues(segment)
+        cleaned = _cleanup_common_issues(segment)
 
     # Try strict JSON load first
     try:
-        return json.loads(cleaned)
-    except Exception:
+        return _loads(cleaned)
+    except Exception as exc:
+        error = exc
+
+    # Try converting single quotes to double quotes heuristically; without any
+    # single quotes the retry would just fail the same way
+    if "'" in cleaned:
+        try:
+            return _loads(cleaned.replace("'", '"'))
+        except Exception as exc:
+            error = exc
+
+    raise ValueError(f"Failed to parse JSON from model output: {error}\nOriginal segment: {segment}")
+
+
+def safe_parse_json(text: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Attempt to extract and parse the first JSON object/array from text.
+
+    Accepts str or UTF-8 bytes-like input. Text that is already valid JSON is
+    parsed directly (bytes without decoding them first); otherwise the
+    extraction result is cached per input text and each call gets its own
+    copy (see `safe_parse_json.cache_clear`).
+    Raises ValueError if parsing fails.
+    """
+    if not text or not isinstance(text, (str, bytes, bytearray, memoryview)):
+        raise ValueError("No text to parse")
+
+    # Fast path: replies generated in JSON mode are usually already pure JSON
+    try:
+        return _loads(text)
+    except (ValueError, TypeError, RecursionError):
+        # RecursionError: json.loads (used for long digit runs) on deep nesting
         pass
 
-    # Try converting single quotes to double quotes heuristically
+    if not isinstance(text, str):
+        # Extraction works on str (and the cache needs a hashable key), so
+        # decode only once the fast path has failed
+        try:
+            text = bytes(text).decode("utf-8")
+        except UnicodeDecodeError as exc:
+            raise ValueError(f"Model output is not valid UTF-8: {exc}") from exc
+
     try:
-        converted = cleaned.replace("\'", '"')
-        return json.loads(converted)
-    except Exception as exc:
-        raise ValueError(f"Failed to parse JSON from model output: {exc}\nOriginal segment: {segment}")
+        return copy.deepcopy(_parse_extracted(text))
+    except RecursionError as exc:
+        raise ValueError("Parsed JSON is nested too deeply") from exc
+
+
+safe_parse_json.cache_clear = _parse_extracted.cache_clear
+
+
+async def safe_parse_json_async(text: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """`safe_parse_json` in a worker thread, so large replies don't block the event loop."""
+    return await asyncio.to_thread(safe_parse_json, text)
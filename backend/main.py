@@ -1,19 +1,38 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
 from app.api.routes import router
+from app.config.settings import settings
+from app.services import gemini_service
+from app.services.batch_jobs import batch_queue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    gemini_service.open_http_client()
+    gemini_service.start_batcher()
+    batch_queue.start()
+    try:
+        yield
+    finally:
+        await batch_queue.stop()
+        await gemini_service.stop_batcher()
+        await gemini_service.close_http_client()
+
 
 app = FastAPI(
     title="Multimodal Conversation Intelligence Backend",
     description="Backend service for the hackathon — analyzes conversations with Gemini and runs a simple risk engine.",
+    lifespan=lifespan,
 )
 
-app.include_router(router)
-
-
-if __name__ == "__main__":
-    import uvicorn
-
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
-from fastapi.middleware.cors import CORSMiddleware
+# Compress JSON bodies over 1 KB (Starlette leaves text/event-stream alone,
+# so streamed summaries are not buffered)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,4 +40,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-)
\ No newline at end of file
+)
+
+app.include_router(router)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Always a single worker process: the batch job queue, micro-batcher,
+    # summary cache and Groq rate limiter live in process memory, so with
+    # several workers GET /analyze/{job_id} would 404 whenever the poll
+    # landed on a different process than the POST, and each worker would
+    # get its own concurrency budget.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=settings.RELOAD,
+    )
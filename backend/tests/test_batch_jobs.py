@@ -0,0 +1,118 @@
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from app.services import batch_jobs
+from app.services.batch_jobs import BatchJobQueue
+
+
+class FakeBatches:
+    def __init__(self):
+        self.state = "JOB_STATE_RUNNING"
+
+    def get(self, name):
+        return SimpleNamespace(state=SimpleNamespace(name=self.state), dest=SimpleNamespace(file_name=f"{name}-out"))
+
+
+class FakeFiles:
+    def __init__(self):
+        self.lines = []
+
+    def download(self, file):
+        return b"\n".join(orjson.dumps(line) for line in self.lines)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = SimpleNamespace(batches=FakeBatches(), files=FakeFiles(), payloads=[])
+    monkeypatch.setattr(batch_jobs, "get_genai_client", lambda: client)
+
+    def create_batch(self, payload):
+        client.payloads.append(payload)
+        return f"batches/{len(client.payloads)}"
+
+    monkeypatch.setattr(BatchJobQueue, "_create_batch", create_batch)
+    return client
+
+
+def _result(key, text):
+    return {"key": key, "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]}}
+
+
+def test_flushes_on_size_and_reports_status(client):
+    queue = BatchJobQueue(flush_size=2, flush_interval_s=60)
+
+    async def main():
+        queue.start()
+        try:
+            first = await queue.submit("a")
+            queued = await queue.status(first)
+            second = await queue.submit("b")
+            for _ in range(100):
+                if client.payloads:
+                    break
+                await asyncio.sleep(0.01)
+            running = await queue.status(first)
+            client.batches.state = batch_jobs.JOB_STATE_SUCCEEDED
+            client.files.lines = [_result(first, " one "), {"key": second, "error": "boom"}]
+            return queued, running, await queue.status(first), await queue.status(second)
+        finally:
+            await queue.stop()
+
+    queued, running, done, failed = asyncio.run(main())
+    assert len(client.payloads) == 1
+    assert len(client.payloads[0].splitlines()) == 2
+    assert queued == {"status": "QUEUED"}
+    assert running == {"status": "JOB_STATE_RUNNING"}
+    assert done == {"status": batch_jobs.JOB_STATE_SUCCEEDED, "summary": "one"}
+    assert failed == {"status": batch_jobs.JOB_STATE_SUCCEEDED, "detail": "boom"}
+    assert asyncio.run(queue.status("unknown")) is None
+
+
+def test_stop_flushes_the_buffer(client):
+    queue = BatchJobQueue(flush_size=10, flush_interval_s=60)
+
+    async def main():
+        queue.start()
+        job_id = await queue.submit("a")
+        await queue.stop()
+        return await queue.status(job_id)
+
+    assert asyncio.run(main()) == {"status": "JOB_STATE_RUNNING"}
+    assert len(client.payloads) == 1
+
+
+def test_failed_create_marks_jobs_failed(client, monkeypatch):
+    def fail(self, payload):
+        raise RuntimeError("upload failed")
+
+    monkeypatch.setattr(BatchJobQueue, "_create_batch", fail)
+    queue = BatchJobQueue(flush_size=10, flush_interval_s=60)
+
+    async def main():
+        queue.start()
+        job_id = await queue.submit("a")
+        await queue.stop()
+        return await queue.status(job_id)
+
+    assert asyncio.run(main()) == {"status": "FAILED", "detail": "Failed to submit batch job"}
+
+
+def test_restart_on_a_new_loop(client):
+    queue = BatchJobQueue(flush_size=10, flush_interval_s=60)
+
+    async def main():
+        queue.start()
+        await queue.submit("a")
+        await queue.stop()
+
+    asyncio.run(main())
+    asyncio.run(main())
+    assert len(client.payloads) == 2
+
+
+def test_submit_requires_start():
+    with pytest.raises(RuntimeError):
+        asyncio.run(BatchJobQueue().submit("a"))
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from app.services import gemini_service
+from app.services.batcher import BatcherConfig, MicroBatcher
+
+
+def test_concurrent_submits_share_one_batch():
+    batches = []
+
+    async def handler(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(handler, BatcherConfig(max_batch=8, max_wait_ms=50))
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2, 3, 4]]
+
+
+def test_max_batch_splits_batches():
+    sizes = []
+
+    async def handler(items):
+        sizes.append(len(items))
+        return items
+
+    async def main():
+        batcher = MicroBatcher(handler, BatcherConfig(max_batch=2, max_wait_ms=50))
+        batcher.start()
+        try:
+            await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        finally:
+            await batcher.stop()
+
+    asyncio.run(main())
+    assert sorted(sizes) == [1, 2, 2]
+
+
+def test_handler_error_fails_every_caller():
+    async def handler(items):
+        raise RuntimeError("boom")
+
+    async def main():
+        batcher = MicroBatcher(handler, BatcherConfig(max_wait_ms=10))
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) and str(r) == "boom" for r in results)
+
+
+def test_stop_fails_items_being_collected():
+    async def handler(items):
+        return items
+
+    async def main():
+        batcher = MicroBatcher(handler, BatcherConfig(max_wait_ms=5000))
+        batcher.start()
+        pending = [asyncio.create_task(batcher.submit(i)) for i in range(2)]
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), 1)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) and str(r) == "Batcher stopped" for r in results)
+
+
+def test_submit_requires_start():
+    async def main():
+        batcher = MicroBatcher(lambda items: items)
+        await batcher.submit(1)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+
+
+def test_restart_on_a_new_loop():
+    async def handler(items):
+        return items
+
+    batcher = MicroBatcher(handler, BatcherConfig(max_wait_ms=10))
+
+    async def main():
+        batcher.start()
+        try:
+            return await batcher.submit("x")
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(main()) == "x"
+    assert asyncio.run(main()) == "x"
+
+
+@pytest.fixture
+def fake_complete(monkeypatch):
+    calls = []
+
+    def install(batch_reply):
+        async def complete(system, content):
+            calls.append(system)
+            if system is gemini_service._BATCH_SUMMARY_SYSTEM:
+                return batch_reply
+            return f"summary of {content}"
+
+        monkeypatch.setattr(gemini_service, "_HAS_KEY", True)
+        monkeypatch.setattr(gemini_service, "_complete", complete)
+        return calls
+
+    return install
+
+
+def test_summarize_many_uses_one_call(fake_complete):
+    calls = fake_complete('Sure: ["first", "second"]')
+    assert asyncio.run(gemini_service._summarize_many(["a", "b"])) == ["first", "second"]
+    assert calls == [gemini_service._BATCH_SUMMARY_SYSTEM]
+
+
+@pytest.mark.parametrize("reply", ["not json", '["only one"]', '[1, 2]'])
+def test_summarize_many_falls_back_to_single_calls(fake_complete, reply):
+    calls = fake_complete(reply)
+    assert asyncio.run(gemini_service._summarize_many(["a", "b"])) == ["summary of a", "summary of b"]
+    assert calls.count(gemini_service._SUMMARY_SYSTEM) == 2
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import math
+import random
+
+import pytest
+
+from app.utils import parser
+from app.utils.parser import safe_parse_json, safe_parse_json_async
+
+SEGMENT_CASES = [
+    ('x {"a": "}"} y', '{"a": "}"}'),
+    ('x {"a": "\\"}"} y', '{"a": "\\"}"}'),
+    ('[1,[2,"]"],3] z', '[1,[2,"]"],3]'),
+    ('pre {"k": "a\\\\"} post', '{"k": "a\\\\"}'),
+    ('{"a": "oops}', None),
+    ('x [ unbalanced {"a":1}', '{"a":1}'),
+    ('r: {"a":[1,2,],"b":{"c":1 ,\n},} end', '{"a":[1,2],"b":{"c":1 \n}}'),
+    ('{"s": "x,}"}', '{"s": "x,}"}'),
+    ("no brackets here", None),
+    ("}{}", "{}"),
+]
+
+
+@pytest.mark.parametrize("text,expected", SEGMENT_CASES)
+def test_segment(text, expected):
+    assert parser._py_first_json_like_segment(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ('Sure! {"a": {"b": [1, 2]}} hope this helps {x}', {"a": {"b": [1, 2]}}),
+        ('Here: {"note": "use } and ] freely"}', {"note": "use } and ] freely"}),
+        ('Quote: {"q": "she said \\"hi\\" }"} done', {"q": 'she said "hi" }'}),
+        ('x {"a": {"x": 1}, "b": 2,} y', {"a": {"x": 1}, "b": 2}),
+        ("[1, 2, ] ok", [1, 2]),
+        ("here {'a': 1}", {"a": 1}),
+        ('```json\n["s1", "s2"]\n```', ["s1", "s2"]),
+    ],
+)
+def test_safe_parse_json(text, expected):
+    assert safe_parse_json(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "no json at all", '{"a": "never closed', "{'a': }"])
+def test_safe_parse_json_rejects(text):
+    with pytest.raises(ValueError):
+        safe_parse_json(text)
+
+
+def test_rejects_non_text():
+    with pytest.raises(ValueError):
+        safe_parse_json(42)
+
+
+@pytest.mark.parametrize(
+    "data,expected",
+    [
+        (b'x {"a": [1, 2,]} y', {"a": [1, 2]}),
+        (bytearray(b"[1, 2]"), [1, 2]),
+        (memoryview(b'{"a": [1, 2]}'), {"a": [1, 2]}),
+        (memoryview(b'ok ["\xc3\xa9"]'), ["\u00e9"]),
+    ],
+)
+def test_bytes_input(data, expected):
+    assert safe_parse_json(data) == expected
+
+
+def test_bytes_input_invalid_utf8():
+    with pytest.raises(ValueError):
+        safe_parse_json(b"\xff {")
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("123456789012345678901234567890", 123456789012345678901234567890),
+        ('big {"id": 123456789012345678901234567890} end', {"id": 123456789012345678901234567890}),
+        (b'{"id": -99999999999999999999}', {"id": -99999999999999999999}),
+    ],
+)
+def test_large_ints_stay_exact(text, expected):
+    value = safe_parse_json(text)
+    assert value == expected
+    assert type(value) is type(expected)
+
+
+def test_nan():
+    assert math.isnan(safe_parse_json('pre {"v": NaN}')["v"])
+
+
+def test_deep_nesting():
+    assert safe_parse_json("pre " + "[" * 300 + "]" * 300) == json.loads("[" * 300 + "]" * 300)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "pre " + "[" * 5000 + "]" * 5000,
+        # A long digit run sends the fast path to json.loads
+        "[" * 5000 + "1234567890123456789" + "]" * 5000,
+    ],
+)
+def test_too_deep_raises_value_error(text):
+    with pytest.raises(ValueError):
+        safe_parse_json(text)
+
+
+def test_cached_result_is_not_shared():
+    text = 'reply: {"a": [1]}'
+    safe_parse_json(text)["a"].append(2)
+    assert safe_parse_json(text) == {"a": [1]}
+
+
+def test_async():
+    assert asyncio.run(safe_parse_json_async('ok {"a": 1}')) == {"a": 1}
+
+
+def _random_text(rng):
+    alphabet = ['{', '}', '[', ']', '"', "\\", ",", " ", "\n", "a", "1", ":"]
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+
+
+def test_cython_parity():
+    fast = pytest.importorskip("app.utils._parser_fast")
+    rng = random.Random(0)
+    cases = [text for text, _ in SEGMENT_CASES] + [_random_text(rng) for _ in range(20_000)]
+    for text in cases:
+        assert fast.first_json_like_segment(text) == parser._py_first_json_like_segment(text), text
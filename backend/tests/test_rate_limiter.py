@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+
+from app.services.rate_limiter import ModelLimiter
+
+
+def _limiter(**kwargs):
+    kwargs.setdefault("backoff_s", 0)
+    kwargs.setdefault("jitter_s", 0)
+    return ModelLimiter("test-model", **kwargs)
+
+
+def _sender(statuses):
+    statuses = iter(statuses)
+    calls = []
+
+    async def send():
+        calls.append(1)
+        return httpx.Response(next(statuses), headers={"retry-after": "0"})
+
+    return send, calls
+
+
+def test_429_is_retried_and_shrinks_the_ceiling():
+    limiter = _limiter(concurrency=4)
+    send, calls = _sender([429, 429, 200])
+
+    response = asyncio.run(limiter.run(send))
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert limiter.limit == 2
+    assert limiter.counters["throttled"] == 2
+    assert limiter.counters["retries"] == 2
+
+
+def test_gives_up_after_max_retries():
+    limiter = _limiter(max_retries=2)
+    send, calls = _sender([429] * 5)
+
+    assert asyncio.run(limiter.run(send)).status_code == 429
+    assert len(calls) == 3
+
+
+def test_successes_grow_the_ceiling():
+    limiter = _limiter(concurrency=2, adaptive_ceiling=3, grow_after=2)
+    send, _ = _sender([200] * 4)
+
+    async def main():
+        for _ in range(4):
+            await limiter.run(send)
+
+    asyncio.run(main())
+    assert limiter.limit == 3
+
+
+def test_concurrency_is_capped():
+    limiter = _limiter(concurrency=2, adaptive_ceiling=2)
+    active = peak = 0
+
+    async def send():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200)
+
+    async def main():
+        await asyncio.gather(*(limiter.run(send) for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+
+
+def test_usable_from_a_second_event_loop():
+    limiter = _limiter(concurrency=1, adaptive_ceiling=1)
+
+    async def send():
+        await asyncio.sleep(0.01)
+        return httpx.Response(200)
+
+    async def main():
+        return await asyncio.gather(*(limiter.run(send) for _ in range(3)))
+
+    for _ in range(2):
+        assert [r.status_code for r in asyncio.run(main())] == [200, 200, 200]
+
+
+def test_stream_retries_429_before_reading():
+    limiter = _limiter(concurrency=2)
+    statuses = iter([429, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), headers={"retry-after": "0"}, content=b"data: hi\n\n")
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            async with limiter.stream(lambda: client.stream("POST", "http://groq.test")) as response:
+                return response.status_code, [line async for line in response.aiter_lines() if line]
+
+    assert asyncio.run(main()) == (200, ["data: hi"])
+    assert limiter.limit == 1
+    assert limiter.counters["retries"] == 1
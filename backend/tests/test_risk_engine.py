@@ -0,0 +1,63 @@
+import pytest
+
+from app.models.schemas import ClientConfig
+from app.services import risk_engine
+from app.services.risk_engine import scan_keywords
+
+# Each backend is forced by hiding the ones ahead of it in _find_keywords
+BACKENDS = {
+    "hyperscan": (),
+    "ahocorasick": ("hyperscan",),
+    "numba": ("hyperscan", "ahocorasick"),
+    "substring": ("hyperscan", "ahocorasick", "njit"),
+}
+
+KEYWORDS = ["Cancel", "refund", "", "cancel my", "my", "café", "FRAUD", "über"]
+TEXTS = [
+    "",
+    "I want to CANCEL my plan",
+    "refunds please, this is fraud",
+    "Le café était froid",
+    "ÜBER alles",
+    "cancelmy",
+    "nothing to see here",
+]
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request, monkeypatch):
+    available = {"hyperscan": risk_engine.hyperscan, "ahocorasick": risk_engine.ahocorasick, "numba": risk_engine.njit}
+    if available.get(request.param, True) is None:
+        pytest.skip(f"{request.param} is not installed")
+    for name in BACKENDS[request.param]:
+        monkeypatch.setattr(risk_engine, name, None)
+    return request.param
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_backends_agree(backend, text):
+    lowered = tuple(k.lower() for k in KEYWORDS)
+    expected = {kw for kw in lowered if kw and kw in text.lower()}
+    assert risk_engine._find_keywords(text.lower(), lowered) == expected
+
+
+def test_scan_keywords_keeps_config_order(backend):
+    result = scan_keywords("my order: cancel it, it's FRAUD", {"risk_keywords": KEYWORDS})
+    assert result == {"trigger_keywords": ["Cancel", "my", "FRAUD"], "keyword_count": len(KEYWORDS)}
+
+
+def test_no_keywords():
+    assert scan_keywords("cancel", {"risk_keywords": [""]})["trigger_keywords"] == []
+    assert scan_keywords("cancel", {}) == {"trigger_keywords": [], "keyword_count": 0}
+
+
+def test_client_config_keywords_can_change():
+    config = ClientConfig(domain="retail", risk_keywords=["refund"])
+    config.risk_keywords = ["Cancel"]
+    assert scan_keywords("cancel now", config)["trigger_keywords"] == ["Cancel"]
+
+    config.risk_keywords.append("NOW")
+    assert scan_keywords("cancel now", config)["trigger_keywords"] == ["Cancel", "NOW"]
+
+    copied = config.model_copy(update={"risk_keywords": ["later"]})
+    assert scan_keywords("see you later", copied)["trigger_keywords"] == ["later"]